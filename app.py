@@ -1,44 +1,704 @@
 import gradio as gr
 import os
+import copy
 import tempfile
 import re
 import logging
+import logging.handlers
+import queue
 import subprocess
+import threading
+import time
+import bisect
+import collections
+import functools
+import dataclasses
+import uuid
+import atexit
+import contextlib
+import shutil
+from concurrent.futures import ThreadPoolExecutor, as_completed, TimeoutError as FutureTimeoutError
 from datetime import datetime
 
-# Setup comprehensive logging
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+import pandas as pd
+from yt_dlp import YoutubeDL
+
+# Setup logging (LOG_LEVEL=DEBUG for per-clip ffmpeg/yt-dlp detail). Worker threads only
+# enqueue records; a listener thread does the formatting and the stderr writes
+_log_queue = queue.SimpleQueue()
+_log_stream = logging.StreamHandler()
+_log_stream.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'))
+_log_listener = logging.handlers.QueueListener(_log_queue, _log_stream)
+logging.basicConfig(level=os.environ.get('LOG_LEVEL', 'INFO').upper(), format='%(message)s',
+                    handlers=[logging.handlers.QueueHandler(_log_queue)])
+_log_listener.start()
+atexit.register(_log_listener.stop)
 logger = logging.getLogger(__name__)
 
+# Opt-in RAM-backed tmpfs (TEMP_ON_SHM=1) so ffmpeg writes skip the disk. Off by default:
+# tmpfs pages are charged to the container's memory cgroup, which statvfs doesn't show,
+# so a full /dev/shm gets the process OOM-killed instead of failing with ENOSPC
+SHM_DIR = '/dev/shm'
+SHM_MIN_FREE = 512 * 1024 * 1024
+TEMP_ON_SHM = os.environ.get('TEMP_ON_SHM', '').lower() in ('1', 'true', 'yes')
+
+def _memory_limit():
+    """The container's cgroup memory limit in bytes (v2 or v1), or None if unlimited/unknown"""
+    for path in ('/sys/fs/cgroup/memory.max', '/sys/fs/cgroup/memory/memory.limit_in_bytes'):
+        try:
+            with open(path) as f:
+                value = f.read().strip()
+        except OSError:
+            continue
+        # v1 reports "unlimited" as a huge page-rounded number
+        if value.isdigit() and int(value) < 1 << 60:
+            return int(value)
+    return None
+
+def _free_bytes(path, in_ram=False):
+    """Usable space under path; for tmpfs also at most half the cgroup memory limit"""
+    try:
+        st = os.statvfs(path)
+    except (OSError, AttributeError):
+        return 0
+    free = st.f_bavail * st.f_frsize
+    limit = _memory_limit() if in_ram else None
+    return min(free, limit // 2) if limit else free
+
+def _pick_temp_base():
+    """Return /dev/shm if opted in, writable and roomy enough, else None (system default)"""
+    if TEMP_ON_SHM and os.path.isdir(SHM_DIR) and os.access(SHM_DIR, os.W_OK):
+        if _free_bytes(SHM_DIR, in_ram=True) >= SHM_MIN_FREE:
+            return SHM_DIR
+        logger.warning("⚠️ TEMP_ON_SHM set but /dev/shm (or the memory limit) is too small - using disk")
+    return None
+
 # Create temp directory
-TEMP_DIR = tempfile.mkdtemp()
+_TEMP_BASE = _pick_temp_base()
+TEMP_DIR = tempfile.mkdtemp(dir=_TEMP_BASE)
 OUTPUT_DIR = os.path.join(TEMP_DIR, "downloads")
 PREVIEW_DIR = os.path.join(TEMP_DIR, "previews")
 os.makedirs(OUTPUT_DIR, exist_ok=True)
 os.makedirs(PREVIEW_DIR, exist_ok=True)
 
-logger.info(f"Temp directory created: {TEMP_DIR}")
-logger.info(f"Output directory: {OUTPUT_DIR}")
-logger.info(f"Preview directory: {PREVIEW_DIR}")
+# Remove everything on shutdown - on /dev/shm a leftover tree would keep holding RAM
+atexit.register(shutil.rmtree, TEMP_DIR, ignore_errors=True)
+
+logger.info("Temp directory created: %s", TEMP_DIR)
+logger.info("Output directory: %s", OUTPUT_DIR)
+logger.info("Preview directory: %s", PREVIEW_DIR)
+
+# Generated clips/previews older than this are swept so a long-running deploy doesn't fill the disk
+CLEANUP_INTERVAL = 300
+FILE_MAX_AGE = 1800
+
+def _cleanup_loop():
+    """Periodically delete stale files (and emptied batch folders) from the output and preview directories"""
+    while True:
+        time.sleep(CLEANUP_INTERVAL)
+        cutoff = time.time() - FILE_MAX_AGE
+        removed = 0
+        for directory in (OUTPUT_DIR, PREVIEW_DIR):
+            for root, dirs, files in os.walk(directory, topdown=False):
+                try:
+                    # Checked before unlinking, which would refresh the folder's mtime
+                    root_stale = os.stat(root).st_mtime < cutoff
+                except OSError:
+                    root_stale = False
+                for name in files:
+                    path = os.path.join(root, name)
+                    try:
+                        if os.stat(path).st_mtime < cutoff:
+                            os.unlink(path)
+                            removed += 1
+                    except OSError:
+                        pass
+                if root != directory and root_stale:
+                    try:
+                        os.rmdir(root)
+                    except OSError:
+                        pass
+        if removed:
+            logger.info("🧹 Cleaned up %s old files", removed)
+
+threading.Thread(target=_cleanup_loop, name="temp-cleanup", daemon=True).start()
+
+# Size cap for clips + previews together, so a burst of requests can't fill the temp
+# filesystem before the age sweep runs; oldest files go first. Defaults to half the space
+# free at startup (for tmpfs, also at most a quarter of the memory limit); OUTPUT_MAX_MB overrides
+if os.environ.get('OUTPUT_MAX_MB'):
+    OUTPUT_MAX_BYTES = int(os.environ['OUTPUT_MAX_MB']) * 1024 * 1024
+else:
+    OUTPUT_MAX_BYTES = _free_bytes(TEMP_DIR, in_ram=_TEMP_BASE == SHM_DIR) // 2
+logger.info("Output quota: %sMB", OUTPUT_MAX_BYTES // (1024 * 1024))
+
+# Files this new are never evicted: their links were just returned or a trim is reading them
+QUOTA_GRACE = 120
+_quota_lock = threading.Lock()
+
+def enforce_output_quota(keep=()):
+    """
+    Delete the oldest generated files until clips + previews fit in OUTPUT_MAX_BYTES
+    Skips files younger than QUOTA_GRACE and any path in keep (e.g. the session's own preview)
+    """
+    keep = {p for p in keep if p}
+    with _quota_lock:
+        files = []
+        for directory in (OUTPUT_DIR, PREVIEW_DIR):
+            for root, dirs, names in os.walk(directory):
+                for name in names:
+                    path = os.path.join(root, name)
+                    try:
+                        st = os.stat(path)
+                    except OSError:
+                        continue
+                    files.append((st.st_mtime, st.st_size, path))
+        
+        total = sum(size for _, size, _ in files)
+        if total <= OUTPUT_MAX_BYTES:
+            return
+        
+        cutoff = time.time() - QUOTA_GRACE
+        removed = 0
+        for mtime, size, path in sorted(files):
+            if total <= OUTPUT_MAX_BYTES or mtime >= cutoff:
+                break
+            if path in keep:
+                continue
+            try:
+                os.unlink(path)
+            except OSError:
+                continue
+            total -= size
+            removed += 1
+    if removed:
+        logger.info("🧹 Over the %sMB output quota: removed %s oldest files", OUTPUT_MAX_BYTES // (1024 * 1024), removed)
+    else:
+        logger.debug("Over the output quota, but every file is still in its grace period")
+
+# Timestamp range like "2:30-3:15" at the start of a line (captures each side and its minutes/seconds);
+# seconds must be 0-59 and the end must not run on into more digits or another ":", so typos like
+# "1:75" or "3:15:00" are skipped rather than silently misread
+_TS_RE = re.compile(r'^[ \t]*((\d+):([0-5]?\d))[ \t]*-[ \t]*((\d+):([0-5]?\d))[ \t]*(?:$|[^\d:\s])')
+
+# Search results table columns
+RESULT_HEADERS = ["#", "Title", "Views", "Duration", "Uploader"]
+
+# Upper bound on clips parsed from one paste
+MAX_CLIPS = 200
+
+# Skipped-line warnings shown in a status before the rest are summarized
+MAX_SKIPPED_WARNINGS = 5
+
+# Recent searches, least recently used first: (normalized query, max_results) -> (timestamp, videos)
+SEARCH_CACHE_TTL = 300
+SEARCH_CACHE_SIZE = 64
+_search_cache = collections.OrderedDict()
+_search_cache_lock = threading.Lock()
+
+# Resolved stream URLs: (video_url, quality) -> (expires_at, direct_url, http_headers)
+DIRECT_URL_TTL = 3 * 3600
+DIRECT_URL_CACHE_SIZE = 128
+_direct_url_cache = {}
+_direct_url_lock = threading.Lock()
+_EXPIRE_RE = re.compile(r'[?&/]expire[=/](\d+)')
+
+# Per-video metadata fetched in the background on selection: video_url -> Future of
+# (expires_at, info). The info holds signed format URLs, so it is only reused until they expire
+_video_info = {}
+_video_info_lock = threading.Lock()
+_info_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="info-prefetch")
+
+# Longest a handler waits on an in-flight prefetch (seconds) before extracting directly,
+# so one stalled extraction can't hang every preview/download of that video
+PREFETCH_WAIT = float(os.environ.get('PREFETCH_WAIT', 20))
+
+# Parallel clip downloads per request (capped to avoid YouTube throttling);
+# CLIP_WORKERS=1 downloads clips one after another
+MAX_DOWNLOAD_WORKERS = max(1, int(os.environ.get('CLIP_WORKERS', 4)))
+
+# Clips this close together (seconds) are fetched as one span: streaming the gap
+# is cheaper than another connection, format handshake and seek
+CLIP_MERGE_GAP = int(os.environ.get('CLIP_MERGE_GAP', 30))
+
+# Longest span (seconds) one merged group may cover, so a chain of nearby clips can't
+# turn into one huge fetch that outlives its timeout
+MAX_GROUP_SPAN = int(os.environ.get('MAX_GROUP_SPAN', 600))
+
+# Gradio event queue: concurrent handler workers and pending-request cap. Heavy work is
+# already bounded by the fetch/encode slots, so workers are cheap and mostly wait on I/O;
+# a low count would leave searches and previews stuck behind long batch downloads
+QUEUE_CONCURRENCY = max(1, int(os.environ.get('QUEUE_CONCURRENCY', 16)))
+QUEUE_MAX_SIZE = int(os.environ.get('QUEUE_MAX_SIZE', 64))
+
+# libx264 encodes running at once across all sessions; stream copies are I/O-bound
+# and don't take a slot
+ENCODE_SLOTS = int(os.environ.get('ENCODE_SLOTS', os.cpu_count() or 2))
+_encode_slots = threading.BoundedSemaphore(ENCODE_SLOTS)
+
+# Network stream copies (previews, fast cuts, source segments) running at once across all
+# sessions; keeps the total connection count to YouTube bounded while encodes use the CPU
+FETCH_SLOTS = int(os.environ.get('FETCH_SLOTS', 6))
+_fetch_slots = threading.BoundedSemaphore(FETCH_SLOTS)
 
-def search_youtube(query, max_results=15):
-    """Search YouTube using yt_dlp Python API"""
-    logger.info(f"=== SEARCH STARTED ===")
-    logger.info(f"Query: {query}")
+# Write cookies once at startup; yt-dlp calls just reference the file
+COOKIES_FILE = None
+_cookies_content = os.environ.get('YOUTUBE_COOKIES')
+if _cookies_content:
+    COOKIES_FILE = os.path.join(TEMP_DIR, 'cookies.txt')
+    # Single unbuffered write, readable only by this user
+    fd = os.open(COOKIES_FILE, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    try:
+        os.write(fd, _cookies_content.encode())
+    finally:
+        os.close(fd)
+    logger.info("Cookies file: %s", COOKIES_FILE)
+
+class _YDLLogger:
+    """Route yt-dlp's output through our logger: progress lines at debug, warnings/errors as such"""
+    
+    def debug(self, msg):
+        logger.debug("yt-dlp: %s", msg)
+    
+    def info(self, msg):
+        logger.debug("yt-dlp: %s", msg)
+    
+    def warning(self, msg):
+        logger.warning("yt-dlp: %s", msg)
+    
+    def error(self, msg):
+        logger.error("yt-dlp: %s", msg)
+
+# Options shared by every yt-dlp call; callers copy and extend.
+# With a logger set, yt-dlp never writes to stdout/stderr itself
+_BASE_YDL_OPTS = {
+    'quiet': True,
+    'no_warnings': True,
+    'verbose': False,
+    'logger': _YDLLogger(),
+    # A stalled connection fails instead of holding a pool instance (and prefetch worker) forever
+    'socket_timeout': 30,
+}
+if COOKIES_FILE:
+    _BASE_YDL_OPTS['cookiefile'] = COOKIES_FILE
+
+# Resolve ffmpeg/ffprobe once instead of a PATH search on every spawn
+FFMPEG = shutil.which('ffmpeg')
+FFPROBE = shutil.which('ffprobe')
+if FFMPEG:
+    logger.info("Using ffmpeg: %s", FFMPEG)
+    # yt-dlp probes for ffmpeg on its own otherwise
+    _BASE_YDL_OPTS['ffmpeg_location'] = FFMPEG
+else:
+    logger.error("❌ ffmpeg not found on PATH - previews and downloads will fail")
+    FFMPEG = 'ffmpeg'
+# Only used to spot keyframe-aligned trims; without it every trim is re-encoded
+if not FFPROBE:
+    logger.warning("⚠️ ffprobe not found on PATH - preview trims will always re-encode")
+
+# Hardware decode for re-encodes (NVDEC/VAAPI/VideoToolbox); ffmpeg falls back to software
+# when no device exists. FFMPEG_HWACCEL="" disables it
+_HWACCEL = os.environ.get('FFMPEG_HWACCEL', 'auto')
+_HWACCEL_ARGS = ['-hwaccel', _HWACCEL] if _HWACCEL else []
+
+# Precise re-encode: exact cuts with optimized compression
+_PRECISE_ENCODE_ARGS = [
+    '-c:v', 'libx264',
+    '-preset', 'fast',
+    '-crf', '26',
+    '-threads', '0',
+    # Short clips: skip B-frame lookahead, one reference frame
+    '-x264-params', 'rc-lookahead=10:bframes=0:ref=1',
+    '-c:a', 'aac',
+    '-b:a', '128k',
+    '-movflags', '+faststart',
+]
+
+# Audio is re-encoded whenever video is: an input-side -ss re-encode starts exactly at the cut,
+# but copied audio would start at the keyframe before it, leaving seconds of leading sound
+# and the picture out of sync. Only the full stream-copy paths copy audio
+
+# 9:16 vertical crop for TikTok/Reels/Shorts - the CPU-heavy path, so tuned for speed:
+# fast scaler, ultrafast x264 on all cores.
+# Multi-core hosts that care more about file size can set CROP_PRESET=veryfast CROP_CRF=28
+# (~4x smaller, ~2x slower on one core)
+CROP_PRESET = os.environ.get('CROP_PRESET', 'ultrafast')
+CROP_CRF = os.environ.get('CROP_CRF', '26')
+
+# Scale/crop filter threads per encode; half the cores leaves room for x264 and parallel clips
+_FILTER_THREADS = max(1, (os.cpu_count() or 1) // 2)
+
+_CROP_FILTER = 'scale=1080:1920:force_original_aspect_ratio=increase:flags=fast_bilinear,crop=1080:1920'
+
+_CROP_ENCODE_ARGS = [
+    '-vf', _CROP_FILTER,
+    '-filter_threads', str(_FILTER_THREADS),
+    '-c:v', 'libx264',
+    '-preset', CROP_PRESET,
+    '-crf', CROP_CRF,
+    '-threads', '0',
+    '-c:a', 'aac',
+    '-b:a', '128k',
+    '-movflags', '+faststart',
+]
+
+# Hardware H.264 encoders, in order of preference: name -> (device args, upload filter, codec args).
+# Used for re-encodes when one actually works on this host; otherwise libx264 as above.
+# FFMPEG_ENCODER=auto (default) picks the first that works, a name forces it, libx264 disables
+FFMPEG_ENCODER = os.environ.get('FFMPEG_ENCODER', 'auto')
+_HW_ENCODERS = {
+    'h264_nvenc': ([], None,
+                   ['-c:v', 'h264_nvenc', '-preset', 'p4', '-tune', 'll', '-rc', 'vbr', '-cq', '26', '-b:v', '0']),
+    'h264_vaapi': (['-vaapi_device', os.environ.get('VAAPI_DEVICE', '/dev/dri/renderD128')], 'format=nv12,hwupload',
+                   ['-c:v', 'h264_vaapi', '-qp', '26']),
+    # Constant quality (1-100, ~60 matches CRF 26) instead of a fixed bitrate that starves
+    # 1080p crops and wastes space on 480p; -q:v needs Apple Silicon, so Intel Macs fail the
+    # probe and fall back to libx264
+    'h264_videotoolbox': ([], None,
+                          ['-c:v', 'h264_videotoolbox', '-q:v', '60']),
+}
+
+# Muted output: no audio demux/encode/mux at all
+_MUTE_ARGS = ['-an']
+
+# First video + first audio (if any) only; data/subtitle/unknown streams are dropped
+# rather than copied (or failing the mux)
+_STREAM_MAP_ARGS = ['-map', '0:v:0', '-map', '0:a:0?', '-dn', '-sn', '-ignore_unknown']
+
+# Trim starts this close to a keyframe are cut by stream copy instead of re-encoding
+KEYFRAME_TOLERANCE = 0.1
+
+@dataclasses.dataclass(slots=True)
+class Video:
+    """One search result (slots keep the per-result footprint small)"""
+    title: str
+    url: str
+    duration: int
+    view_count: int
+    thumbnail: str
+    uploader: str
+    id: str
+    # Results-table cells, formatted once per search so cached re-renders do no work
+    row: tuple = dataclasses.field(default=(), init=False, repr=False, compare=False)
+    
+    def __post_init__(self):
+        self.row = (self.title, format_views(self.view_count), format_duration(self.duration), self.uploader)
+
+# Idle YoutubeDL instances per quality, shared by all threads and batches so
+# construction is paid once per concurrent user of an instance, not per call or pool thread
+_ydl_pool = {}
+_ydl_all = []
+_ydl_pool_lock = threading.Lock()
+
+@contextlib.contextmanager
+def _get_ydl(quality=None, search_results=None):
+    """
+    Check out an idle YoutubeDL (created on first use, ~100ms) and return it afterwards
+    Pooled per quality for format selection, or per result count for flat searches
+    """
+    pool_key = ('search', search_results) if search_results else quality
+    with _ydl_pool_lock:
+        idle = _ydl_pool.setdefault(pool_key, [])
+        ydl = idle.pop() if idle else None
+    
+    if ydl is None:
+        ydl_opts = dict(_BASE_YDL_OPTS)
+        if quality:
+            ydl_opts['format'] = f'best[height<={quality}][ext=mp4]/best[ext=mp4]/best'
+        if search_results:
+            # Flat listing only: no per-result extraction, no player/JS setup the search never uses
+            ydl_opts.update(
+                extract_flat='in_playlist',
+                skip_download=True,
+                playlistend=search_results,
+                extractor_args={'youtube': {'player_skip': ['configs', 'webpage', 'js']}}
+            )
+        ydl = YoutubeDL(ydl_opts)
+        with _ydl_pool_lock:
+            _ydl_all.append(ydl)
     
     try:
-        import yt_dlp
-        
-        ydl_opts = {
-            'quiet': True,
-            'no_warnings': True,
-            'extract_flat': True,
-            'skip_download': True,
-        }
-        
-        logger.info(f"Search options: {ydl_opts}")
-        
-        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+        yield ydl
+    finally:
+        with _ydl_pool_lock:
+            _ydl_pool[pool_key].append(ydl)
+
+@atexit.register
+def _close_ydls():
+    """Close pooled YoutubeDL instances so cookie jars are flushed at exit"""
+    for ydl in _ydl_all:
+        try:
+            ydl.close()
+        except Exception:
+            pass
+
+def fetch_video_info(video_url):
+    """
+    Fetch raw video metadata once so each clip only has to pick a format
+    Returns (expires_at, info); expiry comes from the signed format URLs inside
+    """
+    with _get_ydl() as ydl:
+        info = ydl.extract_info(video_url, download=False, process=False)
+    
+    expires_at = time.time() + DIRECT_URL_TTL
+    for fmt in info.get('formats') or ():
+        match = _EXPIRE_RE.search(fmt.get('url') or '')
+        if match:
+            expires_at = min(expires_at, int(match.group(1)) - 60)
+            break
+    return expires_at, info
+
+def prefetch_video_info(video_url):
+    """Start fetching a video's metadata in the background, unless a fresh or in-flight copy exists"""
+    with _video_info_lock:
+        future = _video_info.get(video_url)
+        if future is not None:
+            if not future.done():
+                return
+            if future.exception() is None and time.time() < future.result()[0]:
+                return
+        _video_info[video_url] = _info_executor.submit(fetch_video_info, video_url)
+        if len(_video_info) > DIRECT_URL_CACHE_SIZE:
+            _video_info.pop(next(iter(_video_info)), None)
+
+def _prefetched_info(video_url):
+    """The prefetched metadata if it is still fresh (waits up to PREFETCH_WAIT for an in-flight fetch), else None"""
+    with _video_info_lock:
+        future = _video_info.get(video_url)
+    if future is None:
+        return None
+    try:
+        expires_at, info = future.result(timeout=PREFETCH_WAIT)
+    except FutureTimeoutError:
+        logger.warning("⚠️ Metadata prefetch still running after %ss, extracting directly: %s", PREFETCH_WAIT, video_url)
+        # Let the next selection start a fresh prefetch instead of waiting on this one
+        with _video_info_lock:
+            if _video_info.get(video_url) is future:
+                del _video_info[video_url]
+        return None
+    except Exception as e:
+        logger.warning("Metadata prefetch failed, extracting directly: %s", e)
+        return None
+    if time.time() >= expires_at:
+        logger.debug("Prefetched metadata expired: %s", video_url)
+        return None
+    return info
+
+def _resolve_direct_url(video_url, quality):
+    """Get (direct stream URL, HTTP headers) for a quality, reusing cached or pre-fetched metadata"""
+    key = (video_url, quality)
+    now = time.time()
+    with _direct_url_lock:
+        cached = _direct_url_cache.get(key)
+    if cached and now < cached[0]:
+        logger.debug("Direct URL cache hit: %s @ %sp", video_url, quality)
+        return cached[1], cached[2]
+    
+    info_dict = _prefetched_info(video_url)
+    with _get_ydl(quality) as ydl:
+        if info_dict is not None:
+            info = ydl.process_ie_result(copy.deepcopy(info_dict), download=False)
+        else:
+            info = ydl.extract_info(video_url, download=False)
+    direct_url = info['url']
+    http_headers = info.get('http_headers') or {}
+    
+    # Signed URLs carry their own expiry; stop using them a minute early
+    expires_at = now + DIRECT_URL_TTL
+    match = _EXPIRE_RE.search(direct_url)
+    if match:
+        expires_at = min(expires_at, int(match.group(1)) - 60)
+    
+    with _direct_url_lock:
+        _direct_url_cache[key] = (expires_at, direct_url, http_headers)
+        if len(_direct_url_cache) > DIRECT_URL_CACHE_SIZE:
+            _direct_url_cache.pop(next(iter(_direct_url_cache)), None)
+    return direct_url, http_headers
+
+# Ride out CDN hiccups: reconnect instead of stalling until the outer timeout
+_NETWORK_INPUT_ARGS = [
+    '-rw_timeout', '30000000',
+    '-reconnect', '1',
+    '-reconnect_streamed', '1',
+    '-reconnect_on_network_error', '1',
+    '-reconnect_delay_max', '5',
+]
+
+@functools.lru_cache(maxsize=1)
+def _network_input_args():
+    """_NETWORK_INPUT_ARGS minus the http options this ffmpeg build doesn't know (an unknown
+    input option fails the whole run), probed once"""
+    try:
+        listed = subprocess.run([FFMPEG, '-hide_banner', '-h', 'protocol=http'], capture_output=True, text=True, timeout=10).stdout
+    except (OSError, subprocess.TimeoutExpired) as e:
+        logger.warning("⚠️ http option probe failed: %s", e)
+        listed = ''
+    
+    args = []
+    dropped = []
+    for name, value in zip(_NETWORK_INPUT_ARGS[::2], _NETWORK_INPUT_ARGS[1::2]):
+        # -rw_timeout is a generic protocol option, so it isn't in the http listing
+        if name == '-rw_timeout' or f"{name} " in listed:
+            args += [name, value]
+        else:
+            dropped.append(name)
+    if dropped:
+        logger.warning("⚠️ ffmpeg lacks http options %s - streams reconnect less eagerly", ' '.join(dropped))
+    return args
+
+def _stream_input_args(video_url, quality):
+    """ffmpeg input args (ending in -i URL) for the video's direct stream, with yt-dlp's headers"""
+    direct_url, http_headers = _resolve_direct_url(video_url, quality)
+    if not direct_url.startswith(('http://', 'https://')):
+        return ['-i', direct_url]
+    
+    # Same headers yt-dlp negotiated, so googlevideo doesn't 403 mid-download
+    input_args = list(_network_input_args())
+    if http_headers:
+        input_args += ['-headers', ''.join(f"{k}: {v}\r\n" for k, v in http_headers.items())]
+    return input_args + ['-i', direct_url]
+
+def _run_ffmpeg(ffmpeg_cmd, timeout):
+    """Run one ffmpeg command, keeping only the last stderr lines; raises with them on failure"""
+    # Errors only: no banner, no per-frame progress lines for ffmpeg to format and us to drain
+    ffmpeg_cmd = [ffmpeg_cmd[0], '-hide_banner', '-loglevel', 'error', '-nostats', *ffmpeg_cmd[1:]]
+    proc = subprocess.Popen(ffmpeg_cmd, stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    
+    # Drain stderr on a side thread so a chatty encoder can't fill the pipe,
+    # and memory stays bounded however long the clip is
+    tail = collections.deque(maxlen=50)
+    drain = threading.Thread(target=tail.extend, args=(proc.stderr,), daemon=True)
+    drain.start()
+    
+    try:
+        proc.wait(timeout=timeout)
+    except subprocess.TimeoutExpired:
+        proc.kill()
+        proc.wait()
+        raise
+    finally:
+        drain.join()
+        proc.stderr.close()
+    
+    if proc.returncode != 0:
+        stderr = b''.join(tail).decode('utf-8', errors='replace')
+        logger.error("FFmpeg error: %s", stderr[-500:])
+        raise Exception(f"FFmpeg failed: {stderr[-200:]}")
+
+@functools.lru_cache(maxsize=None)
+def _video_encoder():
+    """
+    The H.264 encoder for re-encodes, picked once per process
+    A hardware encoder must be compiled in AND pass a tiny test encode (a build can list
+    h264_nvenc with no GPU present); anything else falls back to libx264
+    """
+    if FFMPEG_ENCODER == 'auto':
+        candidates = list(_HW_ENCODERS)
+    elif FFMPEG_ENCODER in _HW_ENCODERS:
+        candidates = [FFMPEG_ENCODER]
+    else:
+        return 'libx264'
+    
+    try:
+        listed = subprocess.run([FFMPEG, '-hide_banner', '-encoders'], capture_output=True, text=True, timeout=10).stdout
+    except (OSError, subprocess.TimeoutExpired) as e:
+        logger.warning("⚠️ Encoder probe failed: %s", e)
+        return 'libx264'
+    
+    for name in candidates:
+        if f" {name} " not in listed:
+            continue
+        device_args, upload, codec_args = _HW_ENCODERS[name]
+        try:
+            result = subprocess.run(
+                [FFMPEG, '-hide_banner', '-loglevel', 'error', *device_args,
+                 '-f', 'lavfi', '-i', 'color=size=256x256:duration=0.2',
+                 *(['-vf', upload] if upload else []), *codec_args, '-f', 'null', '-'],
+                capture_output=True,
+                timeout=15
+            )
+        except (OSError, subprocess.TimeoutExpired):
+            continue
+        if result.returncode == 0:
+            logger.info("🚀 Hardware encoder: %s", name)
+            return name
+    
+    logger.info("Hardware encoder: none usable, using libx264")
+    return 'libx264'
+
+def _encode_args(crop_vertical):
+    """Re-encode args for a precise or 9:16 crop output, on the hardware encoder when there is one"""
+    encoder = _video_encoder()
+    if encoder == 'libx264':
+        return _CROP_ENCODE_ARGS if crop_vertical else _PRECISE_ENCODE_ARGS
+    
+    device_args, upload, codec_args = _HW_ENCODERS[encoder]
+    filters = [f for f in (_CROP_FILTER if crop_vertical else None, upload) if f]
+    args = list(device_args)
+    if filters:
+        args.extend(['-vf', ','.join(filters), '-filter_threads', str(_FILTER_THREADS)])
+    args.extend(codec_args)
+    args.extend(['-c:a', 'aac', '-b:a', '128k'])
+    args.extend(['-movflags', '+faststart'])
+    return args
+
+def _probe_keyframes(path):
+    """Sorted keyframe timestamps (seconds) of a local video, cached until the file changes"""
+    try:
+        mtime = os.stat(path).st_mtime
+    except OSError:
+        return ()
+    return _probe_keyframes_cached(path, mtime)
+
+@functools.lru_cache(maxsize=64)
+def _probe_keyframes_cached(path, mtime):
+    """Run ffprobe once per (path, mtime); () if ffprobe is unavailable"""
+    if not FFPROBE:
+        return ()
+    try:
+        result = subprocess.run(
+            [FFPROBE, '-v', 'error', '-select_streams', 'v:0', '-skip_frame', 'nokey',
+             '-show_entries', 'frame=pts_time', '-of', 'csv=p=0', path],
+            capture_output=True,
+            text=True,
+            timeout=30
+        )
+    except (OSError, subprocess.TimeoutExpired) as e:
+        logger.warning("⚠️ Keyframe probe failed: %s", e)
+        return ()
+    
+    keyframes = []
+    for line in result.stdout.splitlines():
+        try:
+            keyframes.append(float(line.strip().rstrip(',')))
+        except ValueError:
+            continue
+    keyframes.sort()
+    return tuple(keyframes)
+
+def _near_keyframe(path, t):
+    """True if a keyframe lies within KEYFRAME_TOLERANCE of t, so a stream copy cut is exact"""
+    keyframes = _probe_keyframes(path)
+    pos = bisect.bisect_left(keyframes, t)
+    return any(abs(keyframes[j] - t) <= KEYFRAME_TOLERANCE for j in (pos - 1, pos) if 0 <= j < len(keyframes))
+
+def search_youtube(query, max_results=15, refresh=False):
+    """Search YouTube using yt_dlp Python API (refresh=True skips the cached results)"""
+    logger.debug("=== SEARCH STARTED ===")
+    logger.info("Query: %s", query)
+    
+    cache_key = (query.strip().lower(), max_results)
+    with _search_cache_lock:
+        cached = None if refresh else _search_cache.get(cache_key)
+        if cached:
+            _search_cache.move_to_end(cache_key)
+    if cached and time.time() - cached[0] < SEARCH_CACHE_TTL:
+        videos = cached[1]
+        logger.info("Cache hit: %s videos", len(videos))
+        return videos, f"✅ Found {len(videos)} videos (cached - 🔄 Refresh for new results)"
+    
+    try:
+        with _get_ydl(search_results=max_results) as ydl:
             search_result = ydl.extract_info(f"ytsearch{max_results}:{query}", download=False)
         
         if not search_result or 'entries' not in search_result:
@@ -48,102 +708,130 @@ def search_youtube(query, max_results=15):
         videos = []
         for entry in search_result['entries']:
             if entry:
-                videos.append({
-                    'title': entry.get('title', 'No title')[:100],
-                    'url': entry.get('url', ''),
-                    'duration': entry.get('duration', 0),
-                    'view_count': entry.get('view_count', 0),
-                    'thumbnail': entry.get('thumbnail', ''),
-                    'uploader': entry.get('uploader', 'Unknown')[:50],
-                    'id': entry.get('id', '')
-                })
-        
-        logger.info(f"Found {len(videos)} videos")
+                videos.append(Video(
+                    title=entry.get('title', 'No title')[:100],
+                    url=entry.get('url', ''),
+                    duration=entry.get('duration', 0),
+                    view_count=entry.get('view_count', 0),
+                    thumbnail=entry.get('thumbnail', ''),
+                    uploader=entry.get('uploader', 'Unknown')[:50],
+                    id=entry.get('id', '')
+                ))
+        
+        logger.info("Found %s videos", len(videos))
         
         if not videos:
             return None, "❌ No valid results found."
         
+        with _search_cache_lock:
+            _search_cache[cache_key] = (time.time(), videos)
+            _search_cache.move_to_end(cache_key)
+            if len(_search_cache) > SEARCH_CACHE_SIZE:
+                _search_cache.popitem(last=False)
+        
         return videos, f"✅ Found {len(videos)} videos"
         
     except Exception as e:
-        logger.error(f"Search error: {str(e)}", exc_info=True)
+        logger.error("Search error: %s", e, exc_info=True)
         return None, f"❌ Search error: {str(e)[:200]}"
 
 def format_duration(seconds):
     """Convert seconds to MM:SS format"""
     if not seconds:
         return "Unknown"
-    mins = int(seconds // 60)
-    secs = int(seconds % 60)
+    mins, secs = divmod(int(seconds), 60)
     return f"{mins}:{secs:02d}"
 
+# (threshold, divisor, suffix), largest first
+_VIEW_UNITS = ((1_000_000, 1e6, 'M'), (1_000, 1e3, 'K'))
+
 def format_views(count):
     """Format view count"""
     if not count:
         return "Unknown"
-    if count >= 1000000:
-        return f"{count/1000000:.1f}M"
-    elif count >= 1000:
-        return f"{count/1000:.1f}K"
+    for threshold, divisor, suffix in _VIEW_UNITS:
+        if count >= threshold:
+            return f"{count/divisor:.1f}{suffix}"
     return str(count)
 
-def parse_timestamp(timestamp_str):
-    """Convert MM:SS to seconds"""
-    try:
-        parts = timestamp_str.strip().split(':')
-        if len(parts) == 2:
-            mins, secs = int(parts[0]), int(parts[1])
-            return mins * 60 + secs
-        return None
-    except:
-        return None
-
 def parse_timestamps(text):
-    """Parse multiple timestamp ranges"""
-    logger.info(f"=== PARSING TIMESTAMPS ===")
-    logger.info(f"Raw input: {text}")
+    """
+    Parse multiple timestamp ranges, one per line
+    Returns (clips, warning lines) - the warnings name the lines that were skipped
+    """
+    logger.debug("=== PARSING TIMESTAMPS ===")
+    logger.debug("Raw input: %s", text)
     
-    lines = text.strip().split('\n')
-    clips = []
+    clips, skipped = [], []
     
-    for line in lines:
-        line = line.strip()
-        if not line:
+    for line in text.splitlines():
+        if not line.strip():
+            continue
+        if len(clips) >= MAX_CLIPS:
+            logger.warning("Clip limit reached (%s), ignoring remaining lines", MAX_CLIPS)
+            skipped.append(f"⚠️ Only the first {MAX_CLIPS} clips are used")
+            break
+        
+        match = _TS_RE.match(line)
+        if not match:
+            skipped.append(f"⚠️ Skipped \"{line.strip()[:40]}\": not a m:ss-m:ss range")
             continue
         
-        match = re.match(r'(\d+:\d+)\s*-\s*(\d+:\d+)', line)
-        if match:
-            start_str, end_str = match.groups()
-            start_sec = parse_timestamp(start_str)
-            end_sec = parse_timestamp(end_str)
-            
-            logger.info(f"Parsed: {start_str} ({start_sec}s) - {end_str} ({end_sec}s)")
-            
-            if start_sec is not None and end_sec is not None and start_sec < end_sec:
-                clips.append({
-                    'start': start_str,
-                    'end': end_str,
-                    'start_sec': start_sec,
-                    'end_sec': end_sec
-                })
+        start_str, start_m, start_s, end_str, end_m, end_s = match.groups()
+        start_sec = int(start_m) * 60 + int(start_s)
+        end_sec = int(end_m) * 60 + int(end_s)
+        
+        logger.debug("Parsed: %s (%ss) - %s (%ss)", start_str, start_sec, end_str, end_sec)
+        
+        if start_sec >= end_sec:
+            skipped.append(f"⚠️ Skipped {start_str}-{end_str}: end is not after start")
+            continue
+        
+        clips.append({
+            'start': start_str,
+            'end': end_str,
+            'start_sec': start_sec,
+            'end_sec': end_sec
+        })
+    
+    # A long paste of notes shouldn't bury the status in warnings
+    if len(skipped) > MAX_SKIPPED_WARNINGS:
+        skipped = skipped[:MAX_SKIPPED_WARNINGS] + [f"⚠️ ...and {len(skipped) - MAX_SKIPPED_WARNINGS} more lines skipped"]
+    
+    logger.info("Total clips parsed: %s (%s lines skipped)", len(clips), len(skipped))
+    return clips, skipped
+
+def fit_clips_to_duration(clips, duration):
+    """
+    Drop clips that start past the end of the video and trim ones that run over it
+    Returns (kept clips, warning lines); unknown duration (live/missing) keeps everything
+    """
+    if not duration:
+        return clips, []
     
-    logger.info(f"Total clips parsed: {len(clips)}")
-    return clips
+    kept, warnings = [], []
+    for clip in clips:
+        if clip['start_sec'] >= duration:
+            warnings.append(f"⚠️ Skipped {clip['start']}-{clip['end']}: video is only {format_duration(duration)} long")
+            continue
+        if clip['end_sec'] > duration:
+            warnings.append(f"⚠️ {clip['start']}-{clip['end']} trimmed to end at {format_duration(duration)}")
+            clip = {**clip, 'end': format_duration(duration), 'end_sec': int(duration)}
+            if clip['end_sec'] <= clip['start_sec']:
+                continue
+        kept.append(clip)
+    return kept, warnings
 
 def generate_preview(video_url, start_time, end_time, preview_name, quality='480'):
     """
     Generate a FAST preview using stream copy
     Returns video path for preview player
     """
-    logger.info(f"\n{'='*80}")
-    logger.info(f"=== GENERATING PREVIEW ===")
-    logger.info(f"{'='*80}")
-    logger.info(f"Video URL: {video_url}")
-    logger.info(f"Start: {start_time}s, End: {end_time}s")
+    logger.debug("=== GENERATING PREVIEW ===")
+    logger.debug("Video URL: %s", video_url)
+    logger.debug("Start: %ss, End: %ss", start_time, end_time)
     
     try:
-        import yt_dlp
-        
         preview_path = os.path.join(PREVIEW_DIR, f"{preview_name}_preview.mp4")
         duration = end_time - start_time
         
@@ -153,215 +841,154 @@ def generate_preview(video_url, start_time, end_time, preview_name, quality='480
         buffer_duration = buffer_end - buffer_start
         
         # Get direct video URL
-        logger.info(f"⚡ Getting direct video URL...")
-        
-        ydl_opts = {
-            'format': f'best[height<={quality}][ext=mp4]/best[ext=mp4]/best',
-            'quiet': True,
-            'no_warnings': True,
-        }
+        logger.debug("⚡ Getting direct video URL...")
         
-        # Add cookies
-        cookies_content = os.environ.get('YOUTUBE_COOKIES')
-        if cookies_content:
-            cookies_file = os.path.join(TEMP_DIR, 'cookies.txt')
-            with open(cookies_file, 'w') as f:
-                f.write(cookies_content)
-            ydl_opts['cookiefile'] = cookies_file
+        input_args = _stream_input_args(video_url, quality)
         
-        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-            info = ydl.extract_info(video_url, download=False)
-            direct_url = info['url']
-        
-        logger.info(f"✅ Got direct URL")
+        logger.debug("✅ Got direct URL")
         
         # FFmpeg FAST stream copy with buffer
-        logger.info(f"⚡⚡ Generating preview with 5s buffer on each side...")
+        logger.debug("⚡⚡ Generating preview with 5s buffer on each side...")
         
+        # No -avoid_negative_ts: the mp4 edit list keeps 0 aligned with buffer_start,
+        # so slider offsets and the cached keyframe times map exactly onto the source
+        # timeline. faststart lets the player begin before the whole file has loaded
         ffmpeg_cmd = [
-            'ffmpeg',
+            FFMPEG,
             '-ss', str(buffer_start),
-            '-i', direct_url,
+            *input_args,
             '-t', str(buffer_duration),
+            *_STREAM_MAP_ARGS,
             '-c', 'copy',
-            '-avoid_negative_ts', 'make_zero',
+            '-movflags', '+faststart',
             '-y',
             preview_path
         ]
         
-        logger.info(f"Running FFmpeg preview...")
-        
-        result = subprocess.run(
-            ffmpeg_cmd,
-            capture_output=True,
-            text=True,
-            timeout=120
-        )
+        logger.debug("Running FFmpeg preview...")
         
-        if result.returncode != 0:
-            logger.error(f"FFmpeg error: {result.stderr[:500]}")
-            raise Exception(f"FFmpeg failed: {result.stderr[:200]}")
+        with _fetch_slots:
+            _run_ffmpeg(ffmpeg_cmd, timeout=120)
         
-        logger.info("Preview generated")
+        logger.debug("Preview generated")
         
-        if os.path.exists(preview_path):
-            file_size = os.path.getsize(preview_path)
-            logger.info(f"✅ PREVIEW SUCCESS: {file_size} bytes")
-            return preview_path, buffer_start, buffer_end, buffer_duration, "✅ Preview ready"
+        try:
+            file_size = os.stat(preview_path).st_size
+        except FileNotFoundError:
+            raise Exception("Preview file not created")
         
-        raise Exception("Preview file not created")
+        logger.info("✅ PREVIEW SUCCESS: %s bytes", file_size)
+        return preview_path, buffer_start, buffer_end, buffer_duration, "✅ Preview ready"
         
     except Exception as e:
-        logger.error(f"❌ Preview failed: {str(e)}", exc_info=True)
+        logger.error("❌ Preview failed: %s", e, exc_info=True)
         return None, 0, 0, 0, f"❌ Preview error: {str(e)[:150]}"
 
-def download_clip_fast(video_url, start_time, end_time, output_name, quality, crop_vertical):
+def download_clip_fast(video_url, start_time, end_time, output_name, quality, crop_vertical, mute=False):
     """
     FAST METHOD: Stream copy (no re-encoding)
     """
-    logger.info(f"\n{'='*80}")
-    logger.info(f"=== FAST MODE DOWNLOAD STARTED ===")
-    logger.info(f"{'='*80}")
-    logger.info(f"Video URL: {video_url}")
-    logger.info(f"Start: {start_time}s, End: {end_time}s, Duration: {end_time - start_time}s")
+    logger.debug("=== FAST MODE DOWNLOAD STARTED ===")
+    logger.debug("Video URL: %s", video_url)
+    logger.debug("Start: %ss, End: %ss, Duration: %ss", start_time, end_time, end_time - start_time)
+    
+    # Crop needs a re-encode anyway - hand off before resolving the URL twice
+    if crop_vertical:
+        logger.warning("⚠️ Crop requires re-encoding - switching to precise mode")
+        return download_clip_precise(video_url, start_time, end_time, output_name, quality, crop_vertical, mute)
     
     try:
-        import yt_dlp
-        
         final_path = os.path.join(OUTPUT_DIR, f"{output_name}.mp4")
         duration = end_time - start_time
         
         # Get direct video URL
-        logger.info(f"⚡ STEP 1: Getting direct video URL...")
-        
-        ydl_opts = {
-            'format': f'best[height<={quality}][ext=mp4]/best[ext=mp4]/best',
-            'quiet': True,
-            'no_warnings': True,
-        }
+        logger.debug("⚡ STEP 1: Getting direct video URL...")
         
-        # Add cookies
-        cookies_content = os.environ.get('YOUTUBE_COOKIES')
-        if cookies_content:
-            cookies_file = os.path.join(TEMP_DIR, 'cookies.txt')
-            with open(cookies_file, 'w') as f:
-                f.write(cookies_content)
-            ydl_opts['cookiefile'] = cookies_file
+        input_args = _stream_input_args(video_url, quality)
         
-        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-            info = ydl.extract_info(video_url, download=False)
-            direct_url = info['url']
-        
-        logger.info(f"✅ Got direct URL")
+        logger.debug("✅ Got direct URL")
         
         # FFmpeg FAST stream copy
-        logger.info(f"⚡⚡ STEP 2: Fast stream copy (no re-encoding)...")
-        
-        if crop_vertical:
-            logger.warning("⚠️ Crop requires re-encoding - switching to precise mode")
-            return download_clip_precise(video_url, start_time, end_time, output_name, quality, crop_vertical)
+        logger.debug("⚡⚡ STEP 2: Fast stream copy (no re-encoding)...")
         
         ffmpeg_cmd = [
-            'ffmpeg',
+            FFMPEG,
             '-ss', str(start_time),
-            '-i', direct_url,
+            *input_args,
             '-t', str(duration),
+            *_STREAM_MAP_ARGS,
             '-c', 'copy',
+            *(_MUTE_ARGS if mute else []),
+            '-movflags', '+faststart',
             '-avoid_negative_ts', 'make_zero',
             '-y',
             final_path
         ]
         
-        logger.info(f"Running FFmpeg stream copy...")
+        logger.debug("Running FFmpeg stream copy...")
         
-        result = subprocess.run(
-            ffmpeg_cmd,
-            capture_output=True,
-            text=True,
-            timeout=180
-        )
+        with _fetch_slots:
+            _run_ffmpeg(ffmpeg_cmd, timeout=180)
         
-        if result.returncode != 0:
-            logger.error(f"FFmpeg error: {result.stderr[:500]}")
-            raise Exception(f"FFmpeg failed: {result.stderr[:200]}")
+        logger.debug("FFmpeg complete")
         
-        logger.info("FFmpeg complete")
+        try:
+            file_size = os.stat(final_path).st_size
+        except FileNotFoundError:
+            raise Exception("Output file not created")
         
-        if os.path.exists(final_path):
-            file_size = os.path.getsize(final_path)
-            logger.info(f"✅ FAST SUCCESS: {file_size} bytes")
-            return final_path, f"✅ Downloaded (Fast, {file_size // 1024}KB, ±2s accuracy)"
-        
-        raise Exception("Output file not created")
+        logger.info("✅ FAST SUCCESS: %s bytes", file_size)
+        return final_path, f"✅ Downloaded (Fast, {file_size // 1024}KB, ±2s accuracy)"
         
     except subprocess.TimeoutExpired:
         logger.error("FFmpeg timeout!")
         return None, "❌ Timeout - clip too long"
         
     except Exception as e:
-        logger.error(f"❌ Fast download failed: {str(e)}", exc_info=True)
+        logger.error("❌ Fast download failed: %s", e, exc_info=True)
         return None, f"❌ Error: {str(e)[:150]}"
 
-def download_clip_precise(video_url, start_time, end_time, output_name, quality, crop_vertical):
+def download_clip_precise(video_url, start_time, end_time, output_name, quality, crop_vertical, mute=False):
     """
     PRECISE METHOD: Re-encode for exact timestamps with optimized compression
     """
-    logger.info(f"\n{'='*80}")
-    logger.info(f"=== PRECISE MODE DOWNLOAD STARTED ===")
-    logger.info(f"{'='*80}")
-    logger.info(f"Video URL: {video_url}")
-    logger.info(f"Start: {start_time}s, End: {end_time}s, Duration: {end_time - start_time}s")
+    logger.debug("=== PRECISE MODE DOWNLOAD STARTED ===")
+    logger.debug("Video URL: %s", video_url)
+    logger.debug("Start: %ss, End: %ss, Duration: %ss", start_time, end_time, end_time - start_time)
     
     try:
-        import yt_dlp
-        
         final_path = os.path.join(OUTPUT_DIR, f"{output_name}.mp4")
         duration = end_time - start_time
         
         # Get direct video URL
-        logger.info(f"⚡ STEP 1: Getting direct video URL...")
+        logger.debug("⚡ STEP 1: Getting direct video URL...")
         
-        ydl_opts = {
-            'format': f'best[height<={quality}][ext=mp4]/best[ext=mp4]/best',
-            'quiet': True,
-            'no_warnings': True,
-        }
+        input_args = _stream_input_args(video_url, quality)
         
-        # Add cookies
-        cookies_content = os.environ.get('YOUTUBE_COOKIES')
-        if cookies_content:
-            cookies_file = os.path.join(TEMP_DIR, 'cookies.txt')
-            with open(cookies_file, 'w') as f:
-                f.write(cookies_content)
-            ydl_opts['cookiefile'] = cookies_file
-        
-        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-            info = ydl.extract_info(video_url, download=False)
-            direct_url = info['url']
-        
-        logger.info(f"✅ Got direct URL")
+        logger.debug("✅ Got direct URL")
         
         # FFmpeg PRECISE re-encode
-        logger.info(f"🎯 STEP 2: Precise re-encode with optimized compression...")
+        logger.debug("🎯 STEP 2: Precise re-encode with optimized compression...")
         
+        # A single input-side -ss already does the coarse/fine split: the demuxer jumps
+        # to the keyframe before start_time and only that GOP's pre-roll is decoded
+        # and dropped (accurate_seek). A second output-side -ss would decode the same frames
         ffmpeg_cmd = [
-            'ffmpeg',
+            FFMPEG,
+            *_HWACCEL_ARGS,
             '-ss', str(start_time),
-            '-i', direct_url,
+            *input_args,
             '-t', str(duration),
-            '-c:v', 'libx264',
-            '-preset', 'fast',
-            '-crf', '26',
-            '-c:a', 'aac',
-            '-b:a', '128k',
+            *_STREAM_MAP_ARGS,
         ]
         
         # Add crop if requested
         if crop_vertical:
-            logger.info("Adding 9:16 vertical crop")
-            ffmpeg_cmd.extend([
-                '-vf', 'scale=1080:1920:force_original_aspect_ratio=increase,crop=1080:1920'
-            ])
+            logger.debug("Adding 9:16 vertical crop")
+        ffmpeg_cmd.extend(_encode_args(crop_vertical))
+        
+        if mute:
+            ffmpeg_cmd.extend(_MUTE_ARGS)
         
         ffmpeg_cmd.extend([
             '-avoid_negative_ts', 'make_zero',
@@ -369,43 +996,34 @@ def download_clip_precise(video_url, start_time, end_time, output_name, quality,
             final_path
         ])
         
-        logger.info(f"Running FFmpeg precise re-encode...")
-        
-        result = subprocess.run(
-            ffmpeg_cmd,
-            capture_output=True,
-            text=True,
-            timeout=300
-        )
+        logger.debug("Running FFmpeg precise re-encode...")
         
-        if result.returncode != 0:
-            logger.error(f"FFmpeg error: {result.stderr[:500]}")
-            raise Exception(f"FFmpeg failed: {result.stderr[:200]}")
+        with _encode_slots:
+            _run_ffmpeg(ffmpeg_cmd, timeout=300)
         
-        logger.info("FFmpeg complete")
+        logger.debug("FFmpeg complete")
         
-        if os.path.exists(final_path):
-            file_size = os.path.getsize(final_path)
-            logger.info(f"✅ PRECISE SUCCESS: {file_size} bytes")
-            return final_path, f"✅ Downloaded (Precise, {file_size // 1024}KB, exact timestamps)"
+        try:
+            file_size = os.stat(final_path).st_size
+        except FileNotFoundError:
+            raise Exception("Output file not created")
         
-        raise Exception("Output file not created")
+        logger.info("✅ PRECISE SUCCESS: %s bytes", file_size)
+        return final_path, f"✅ Downloaded (Precise, {file_size // 1024}KB, exact timestamps)"
         
     except subprocess.TimeoutExpired:
         logger.error("FFmpeg timeout!")
         return None, "❌ Timeout - clip too long"
         
     except Exception as e:
-        logger.error(f"❌ Precise download failed: {str(e)}", exc_info=True)
+        logger.error("❌ Precise download failed: %s", e, exc_info=True)
         return None, f"❌ Error: {str(e)[:150]}"
 
-def trim_preview_video(preview_path, trim_start_relative, trim_end_relative, output_name, crop_vertical):
+def trim_preview_video(preview_path, trim_start_relative, trim_end_relative, output_name, crop_vertical, mute=False):
     """
     Trim the preview video based on RELATIVE user adjustments
     """
-    logger.info(f"\n{'='*80}")
-    logger.info(f"=== TRIMMING PREVIEW ===")
-    logger.info(f"{'='*80}")
+    logger.debug("=== TRIMMING PREVIEW ===")
     
     try:
         final_path = os.path.join(OUTPUT_DIR, f"{output_name}.mp4")
@@ -413,25 +1031,30 @@ def trim_preview_video(preview_path, trim_start_relative, trim_end_relative, out
         # Calculate duration from relative timestamps
         duration = trim_end_relative - trim_start_relative
         
-        logger.info(f"Trimming preview: start={trim_start_relative}s (relative), duration={duration}s")
+        logger.debug("Trimming preview: start=%ss (relative), duration=%ss", trim_start_relative, duration)
         
         ffmpeg_cmd = [
-            'ffmpeg',
+            FFMPEG,
+            *_HWACCEL_ARGS,
             '-ss', str(trim_start_relative),
             '-i', preview_path,
             '-t', str(duration),
-            '-c:v', 'libx264',
-            '-preset', 'fast',
-            '-crf', '26',
-            '-c:a', 'aac',
-            '-b:a', '128k',
+            *_STREAM_MAP_ARGS,
         ]
         
-        if crop_vertical:
-            logger.info("Adding 9:16 vertical crop")
-            ffmpeg_cmd.extend([
-                '-vf', 'scale=1080:1920:force_original_aspect_ratio=increase,crop=1080:1920'
-            ])
+        # Start already on a keyframe: copy the frames we have instead of encoding them again
+        keyframe_cut = not crop_vertical and _near_keyframe(preview_path, trim_start_relative)
+        
+        if keyframe_cut:
+            logger.debug("Trim start is keyframe-aligned - stream copy")
+            ffmpeg_cmd.extend(['-c', 'copy', '-movflags', '+faststart'])
+        else:
+            if crop_vertical:
+                logger.debug("Adding 9:16 vertical crop")
+            ffmpeg_cmd.extend(_encode_args(crop_vertical))
+        
+        if mute:
+            ffmpeg_cmd.extend(_MUTE_ARGS)
         
         ffmpeg_cmd.extend([
             '-avoid_negative_ts', 'make_zero',
@@ -439,102 +1062,192 @@ def trim_preview_video(preview_path, trim_start_relative, trim_end_relative, out
             final_path
         ])
         
-        logger.info(f"Running FFmpeg trim...")
+        logger.debug("Running FFmpeg trim...")
         
-        result = subprocess.run(
-            ffmpeg_cmd,
-            capture_output=True,
-            text=True,
-            timeout=180
-        )
-        
-        if result.returncode != 0:
-            logger.error(f"FFmpeg error: {result.stderr[:500]}")
-            raise Exception(f"FFmpeg failed: {result.stderr[:200]}")
+        if keyframe_cut:
+            _run_ffmpeg(ffmpeg_cmd, timeout=180)
+        else:
+            with _encode_slots:
+                _run_ffmpeg(ffmpeg_cmd, timeout=180)
         
-        if os.path.exists(final_path):
-            file_size = os.path.getsize(final_path)
-            logger.info(f"✅ TRIM SUCCESS: {file_size} bytes")
-            return final_path, f"✅ Trimmed ({file_size // 1024}KB, exact timestamps)"
+        try:
+            file_size = os.stat(final_path).st_size
+        except FileNotFoundError:
+            raise Exception("Output file not created")
         
-        raise Exception("Output file not created")
+        logger.info("✅ TRIM SUCCESS: %s bytes", file_size)
+        if keyframe_cut:
+            return final_path, f"✅ Trimmed ({file_size // 1024}KB, keyframe cut, no re-encode)"
+        return final_path, f"✅ Trimmed ({file_size // 1024}KB, exact timestamps)"
         
     except Exception as e:
-        logger.error(f"❌ Trim failed: {str(e)}", exc_info=True)
+        logger.error("❌ Trim failed: %s", e, exc_info=True)
         return None, f"❌ Error: {str(e)[:150]}"
 
-def download_clip(video_url, start_time, end_time, output_name, quality, crop_vertical, precise_mode):
+def _span_timeout(seconds, base=180):
+    """ffmpeg timeout for streaming `seconds` of media: base budget plus real time"""
+    return base + int(seconds)
+
+def fetch_source_segment(video_url, start_time, end_time, source_name, quality):
+    """
+    Stream copy a span of the video to local disk so several clips can be cut from it
+    Returns the local file path
+    """
+    logger.debug("=== FETCHING SOURCE SEGMENT %ss-%ss ===", start_time, end_time)
+    
+    source_path = os.path.join(TEMP_DIR, f"{source_name}_source.mp4")
+    input_args = _stream_input_args(video_url, quality)
+    
+    # No -avoid_negative_ts here: the mp4 edit list keeps 0 aligned with start_time,
+    # so clip offsets inside the segment stay exact
+    ffmpeg_cmd = [
+        FFMPEG,
+        '-ss', str(start_time),
+        *input_args,
+        '-t', str(end_time - start_time),
+        *_STREAM_MAP_ARGS,
+        '-c', 'copy',
+        '-y',
+        source_path
+    ]
+    
+    with _fetch_slots:
+        _run_ffmpeg(ffmpeg_cmd, timeout=_span_timeout(end_time - start_time))
+    
+    if not os.path.exists(source_path):
+        raise Exception("Source segment not created")
+    
+    return source_path
+
+def download_clip_group(video_url, group_start, group_end, group_clips, output_names, quality, crop_vertical, mute=False):
+    """
+    OVERLAP METHOD: Fetch the span covering nearby clips once, then cut each clip from it
+    Returns a (file_path, msg) pair per clip, in the order of group_clips
+    """
+    logger.info("Fetching %s nearby clips as one segment: %ss-%ss", len(group_clips), group_start, group_end)
+    
+    try:
+        source_path = fetch_source_segment(video_url, group_start, group_end, f"group_{uuid.uuid4().hex[:8]}", quality)
+    except Exception as e:
+        logger.error("❌ Source segment failed: %s", e, exc_info=True)
+        return [(None, f"❌ Error: {str(e)[:150]}")] * len(group_clips)
+    
+    try:
+        with ThreadPoolExecutor(max_workers=min(len(group_clips), MAX_DOWNLOAD_WORKERS)) as executor:
+            futures = []
+            for clip, name in zip(group_clips, output_names):
+                start_relative = clip['start_sec'] - group_start
+                end_relative = clip['end_sec'] - group_start
+                futures.append(executor.submit(
+                    trim_preview_video, source_path, start_relative, end_relative, name, crop_vertical, mute
+                ))
+            return [future.result() for future in futures]
+    finally:
+        # A failed unlink must not replace the clips' results with an exception
+        with contextlib.suppress(OSError):
+            os.unlink(source_path)
+
+def merge_clip_ranges(clips, merge_gap=None, max_span=None):
+    """
+    Group clips whose ranges overlap or sit within merge_gap seconds of each other,
+    so each span is fetched once. A gap is only bridged when it is no longer than the
+    clip time it joins, and no group grows past max_span seconds
+    Returns [start_sec, end_sec, [clip indices]] groups sorted by start
+    """
+    if merge_gap is None:
+        merge_gap = CLIP_MERGE_GAP
+    if max_span is None:
+        max_span = MAX_GROUP_SPAN
+    
+    groups = []
+    clip_time = 0
+    for idx in sorted(range(len(clips)), key=lambda k: clips[k]['start_sec']):
+        clip = clips[idx]
+        length = clip['end_sec'] - clip['start_sec']
+        if groups:
+            group = groups[-1]
+            gap = clip['start_sec'] - group[1]
+            span = max(group[1], clip['end_sec']) - group[0]
+            if gap <= min(merge_gap, clip_time + length) and span <= max_span:
+                group[1] = max(group[1], clip['end_sec'])
+                group[2].append(idx)
+                clip_time += length
+                continue
+        groups.append([clip['start_sec'], clip['end_sec'], [idx]])
+        clip_time = length
+    return groups
+
+def new_batch_dir():
+    """
+    Create a unique folder under OUTPUT_DIR for one download request
+    Returns its name relative to OUTPUT_DIR, for use as an output_name prefix
+    """
+    return os.path.basename(tempfile.mkdtemp(dir=OUTPUT_DIR))
+
+def download_clip(video_url, start_time, end_time, output_name, quality, crop_vertical, precise_mode, mute=False):
     """
     Universal download function - routes to fast or precise method
     """
     if precise_mode:
-        return download_clip_precise(video_url, start_time, end_time, output_name, quality, crop_vertical)
+        return download_clip_precise(video_url, start_time, end_time, output_name, quality, crop_vertical, mute)
     else:
-        return download_clip_fast(video_url, start_time, end_time, output_name, quality, crop_vertical)
-
-# Global state
-search_results = []
-selected_video = None
-current_preview_path = None
-current_buffer_start = 0
-current_buffer_end = 0
-current_clip_info = {}
+        return download_clip_fast(video_url, start_time, end_time, output_name, quality, crop_vertical, mute)
 
-def perform_search(query):
-    """Search and display results"""
-    global search_results
-    
+def perform_search(query, refresh=False):
+    """
+    Search and display results (videos are returned into per-session state)
+    Generator: the status updates immediately, the table once YouTube answers
+    """
     if not query or query.strip() == "":
-        return "❌ Please enter a search query", gr.update(visible=False, value=[])
+        yield "❌ Please enter a search query", gr.update(visible=False, value=[]), gr.update()
+        return
+    
+    yield f"🔎 Searching YouTube for \"{query.strip()}\"...", gr.update(), gr.update()
     
-    videos, msg = search_youtube(query.strip())
+    videos, msg = search_youtube(query.strip(), refresh=refresh)
     
     if videos is None:
-        return msg, gr.update(visible=False, value=[])
-    
-    search_results = videos
-    
-    results_data = []
-    for i, video in enumerate(videos):
-        duration = format_duration(video['duration'])
-        views = format_views(video['view_count'])
-        results_data.append([
-            i,
-            video['title'],
-            views,
-            duration,
-            video['uploader']
-        ])
+        yield msg, gr.update(visible=False, value=[]), gr.update()
+        return
     
-    return msg, gr.update(visible=True, value=results_data)
-
-def select_video_handler(evt: gr.SelectData):
-    """Handle video selection from table"""
-    global selected_video, search_results
+    # Cells were formatted when the results were built; only the index is added here
+    results_data = pd.DataFrame([(i, *v.row) for i, v in enumerate(videos)], columns=RESULT_HEADERS)
     
-    logger.info(f"=== VIDEO SELECTED ===")
+    yield msg, gr.update(visible=True, value=results_data), videos
+
+def refresh_search(query):
+    """Same search, but fetched fresh instead of from the results cache"""
+    yield from perform_search(query, refresh=True)
+
+def select_video_handler(search_results, evt: gr.SelectData):
+    """Handle video selection from table (selected video goes into per-session state)"""
+    logger.debug("=== VIDEO SELECTED ===")
     
     try:
         index = evt.index[0]
-        logger.info(f"Selected index: {index}")
+        logger.info("Selected index: %s", index)
         
         if 0 <= index < len(search_results):
-            selected_video = search_results[index]
+            video = search_results[index]
+            full_url = f"https://www.youtube.com/watch?v={video.id}" if video.id else video.url
             
-            video_id = selected_video.get('id', '')
-            full_url = f"https://www.youtube.com/watch?v={video_id}" if video_id else selected_video.get('url', '')
-            selected_video['url'] = full_url
+            # Copy so per-selection data doesn't leak into cached search results
+            selected_video = dataclasses.replace(video, url=full_url)
             
-            logger.info(f"Selected video: {selected_video['title']}")
-            logger.info(f"Video URL: {full_url}")
+            # Fetch metadata in the background while the user types timestamps; every
+            # preview/clip reuses it instead of re-extracting, and selection doesn't wait on it
+            prefetch_video_info(full_url)
+            
+            logger.info("Selected video: %s", selected_video.title)
+            logger.info("Video URL: %s", full_url)
             
             info = f"""### 📹 Selected Video
 
-**{selected_video['title']}**
+**{selected_video.title}**
 
-- **Duration:** {format_duration(selected_video['duration'])}
-- **Views:** {format_views(selected_video['view_count'])}
-- **Uploader:** {selected_video['uploader']}
+- **Duration:** {format_duration(selected_video.duration)}
+- **Views:** {format_views(selected_video.view_count)}
+- **Uploader:** {selected_video.uploader}
 - **Watch:** [Open on YouTube]({full_url})
 
 ---
@@ -543,49 +1256,60 @@ def select_video_handler(evt: gr.SelectData):
 Format: `2:30-3:15` (one per line)
 """
             
-            return info, gr.update(visible=False), gr.update(visible=True), ""
+            return info, gr.update(visible=False), gr.update(visible=True), "", selected_video
     except Exception as e:
-        logger.error(f"Selection error: {e}", exc_info=True)
+        logger.error("Selection error: %s", e, exc_info=True)
     
-    return "❌ Selection failed", gr.update(visible=True), gr.update(visible=False), ""
+    return "❌ Selection failed", gr.update(visible=True), gr.update(visible=False), "", gr.update()
 
-def generate_preview_handler(timestamps_text, quality):
-    """Generate preview for first clip with RELATIVE timestamps"""
-    global selected_video, current_preview_path, current_buffer_start, current_buffer_end, current_clip_info
-    
+def generate_preview_handler(timestamps_text, quality, selected_video, preview_state):
+    """Generate preview for first clip with RELATIVE timestamps (preview details go to per-session state)"""
     if selected_video is None:
-        return None, "❌ No video selected", gr.update(visible=False), gr.update(), gr.update(), ""
+        return None, "❌ No video selected", gr.update(visible=False), gr.update(), gr.update(), "", gr.update()
     
     if not timestamps_text or timestamps_text.strip() == "":
-        return None, "❌ Please enter timestamps", gr.update(visible=False), gr.update(), gr.update(), ""
+        return None, "❌ Please enter timestamps", gr.update(visible=False), gr.update(), gr.update(), "", gr.update()
     
-    clips = parse_timestamps(timestamps_text)
+    clips, parse_warnings = parse_timestamps(timestamps_text)
+    clips, _ = fit_clips_to_duration(clips, selected_video.duration)
     
     if not clips:
-        return None, "❌ No valid timestamps", gr.update(visible=False), gr.update(), gr.update(), ""
+        return None, "\n".join(["❌ No valid timestamps within the video's length"] + parse_warnings), gr.update(visible=False), gr.update(), gr.update(), "", gr.update()
+    
+    enforce_output_quota(keep=[preview_state and preview_state.get('path')])
     
     # Generate preview for first clip
     first_clip = clips[0]
     
+    # Unique name so concurrent sessions never overwrite each other's preview
     preview_path, buffer_start, buffer_end, preview_duration, msg = generate_preview(
-        selected_video['url'],
+        selected_video.url,
         first_clip['start_sec'],
         first_clip['end_sec'],
-        "clip_1",
+        f"clip_{uuid.uuid4().hex[:8]}",
         quality
     )
     
     if preview_path:
-        current_preview_path = preview_path
-        current_buffer_start = buffer_start
-        current_buffer_end = buffer_end
+        # Probe keyframes while the user watches, so the trim download doesn't wait on ffprobe
+        threading.Thread(target=_probe_keyframes, args=(preview_path,), daemon=True).start()
+        
+        # This session's previous preview is no longer reachable
+        if preview_state and preview_state.get('path') != preview_path:
+            try:
+                os.remove(preview_state['path'])
+            except OSError:
+                pass
         
         # Calculate RELATIVE timestamps (0 = start of preview)
         original_start_relative = first_clip['start_sec'] - buffer_start  # e.g., 5s
         original_end_relative = first_clip['end_sec'] - buffer_start      # e.g., 15s
         
         # Store clip info
-        current_clip_info = {
+        preview_state = {
+            'path': preview_path,
+            'buffer_start': buffer_start,
+            'buffer_end': buffer_end,
             'original_start': first_clip['start'],
             'original_end': first_clip['end'],
             'start_relative': original_start_relative,
@@ -606,6 +1330,8 @@ def generate_preview_handler(timestamps_text, quality):
 
 ⏱️ **Slider range:** 0s to {preview_duration:.1f}s (entire preview video)
 """
+        if parse_warnings:
+            info_text += "\n" + "\n\n".join(parse_warnings) + "\n"
         
         clip_info_text = f"📌 Current selection: {original_start_relative:.1f}s to {original_end_relative:.1f}s (Duration: {original_end_relative - original_start_relative:.1f}s)"
         
@@ -615,51 +1341,52 @@ def generate_preview_handler(timestamps_text, quality):
             gr.update(visible=True),
             gr.update(value=original_start_relative, minimum=0, maximum=preview_duration, step=0.1),
             gr.update(value=original_end_relative, minimum=0, maximum=preview_duration, step=0.1),
-            clip_info_text
+            clip_info_text,
+            preview_state
         )
     
-    return None, msg, gr.update(visible=False), gr.update(), gr.update(), ""
+    return None, msg, gr.update(visible=False), gr.update(), gr.update(), "", gr.update()
 
 def update_clip_info(start, end):
-    """Update the clip duration display"""
+    """Update the clip duration display (runs on every slider tick, so formatting is inlined)"""
     duration = end - start
-    return f"📌 Current selection: {start:.1f}s to {end:.1f}s (Duration: {duration:.1f}s / {format_duration(int(duration))})"
+    mins, secs = divmod(int(duration), 60)
+    return f"📌 Current selection: {start:.1f}s to {end:.1f}s (Duration: {duration:.1f}s / {mins}:{secs:02d})"
 
-def download_from_preview(clip_name, trim_start_relative, trim_end_relative, crop_vertical):
-    """Download using RELATIVE timestamps from preview"""
-    global current_preview_path, current_buffer_start
-    
-    if current_preview_path is None:
+def download_from_preview(clip_name, trim_start_relative, trim_end_relative, crop_vertical, mute, preview_state):
+    """Download using RELATIVE timestamps from this session's preview"""
+    if not preview_state:
         return "❌ No preview available", []
     
-    if not os.path.exists(current_preview_path):
-        return "❌ Preview file not found", []
+    preview_path = preview_state['path']
+    if not os.path.exists(preview_path):
+        return "❌ Preview expired - generate it again", []
     
     if trim_start_relative >= trim_end_relative:
         return "❌ Start time must be before end time", []
     
-    logger.info(f"Downloading from preview: {trim_start_relative}s to {trim_end_relative}s (relative)")
+    logger.info("Downloading from preview: %ss to %ss (relative)", trim_start_relative, trim_end_relative)
+    
+    enforce_output_quota(keep=[preview_path])
     
     file_path, msg = trim_preview_video(
-        current_preview_path,
+        preview_path,
         trim_start_relative,
         trim_end_relative,
-        clip_name if clip_name.strip() else "clip_1",
-        crop_vertical
+        # Own folder per download so sessions picking the same clip name don't collide
+        os.path.join(new_batch_dir(), clip_name.strip() or "clip_1"),
+        crop_vertical,
+        mute
     )
     
-    if file_path and os.path.exists(file_path):
+    if file_path:
         return f"✅ Downloaded from preview!\n{msg}\n\n💡 Tip: Check the video before closing - files are deleted when session ends!", [file_path]
     
     return f"❌ Download failed: {msg}", []
 
-def process_download(timestamps_text, clip_name_prefix, quality, crop_vertical, precise_mode):
+def process_download(timestamps_text, clip_name_prefix, quality, crop_vertical, precise_mode, mute, selected_video):
     """Process and download all clips (original method)"""
-    global selected_video
-    
-    logger.info(f"\n{'='*80}")
-    logger.info(f"=== PROCESSING DOWNLOAD REQUEST ===")
-    logger.info(f"{'='*80}")
+    logger.debug("=== PROCESSING DOWNLOAD REQUEST ===")
     
     if selected_video is None:
         logger.warning("No video selected")
@@ -667,9 +1394,7 @@ def process_download(timestamps_text, clip_name_prefix, quality, crop_vertical,
     
     mode_name = "Precise Mode 🎯" if precise_mode else "Fast Mode ⚡"
     
-    logger.info(f"Video: {selected_video['title']}")
-    logger.info(f"URL: {selected_video['url']}")
-    logger.info(f"Mode: {mode_name}")
+    logger.info("Download request: %s (%s) - %s", selected_video.title, selected_video.url, mode_name)
     
     if not timestamps_text or timestamps_text.strip() == "":
         logger.warning("No timestamps provided")
@@ -678,49 +1403,113 @@ def process_download(timestamps_text, clip_name_prefix, quality, crop_vertical,
     if not clip_name_prefix or clip_name_prefix.strip() == "":
         clip_name_prefix = "clip"
     
-    logger.info(f"Clip name prefix: {clip_name_prefix}")
-    logger.info(f"Quality: {quality}")
-    logger.info(f"Crop vertical: {crop_vertical}")
+    logger.debug("Clip name prefix: %s, quality: %s, crop vertical: %s", clip_name_prefix, quality, crop_vertical)
     
-    clips = parse_timestamps(timestamps_text)
+    clips, parse_warnings = parse_timestamps(timestamps_text)
     
     if not clips:
         logger.warning("No valid timestamps parsed")
-        return "❌ No valid timestamps. Use format: 2:30-3:15 (one per line)", []
+        return "\n".join(["❌ No valid timestamps. Use format: 2:30-3:15 (one per line)"] + parse_warnings), []
+    
+    # Out-of-range clips are rejected here, before any ffmpeg runs into EOF or a timeout
+    clips, range_warnings = fit_clips_to_duration(clips, selected_video.duration)
+    
+    if not clips:
+        logger.warning("All clips are past the end of the video")
+        return "\n".join(["❌ No clips within the video's length"] + range_warnings), []
     
     mode_emoji = "🎯" if precise_mode else "⚡"
-    status_lines = [f"{mode_emoji} Processing {len(clips)} clips using {mode_name}"]
-    status_lines.append(f"📹 Video: {selected_video['title']}\n")
+    status_lines = [f"{mode_emoji} Processing {len(clips)} clips using {mode_name}\n📹 Video: {selected_video.title}\n"]
+    status_lines.extend(parse_warnings)
+    status_lines.extend(range_warnings)
     downloaded_files = []
+    video_url = selected_video.url
     
-    for i, clip in enumerate(clips, 1):
-        clip_filename = f"{clip_name_prefix}_{i}"
-        status_lines.append(f"\n⏳ Clip {i}/{len(clips)}: {clip['start']}-{clip['end']}...")
-        
-        logger.info(f"\n--- Processing clip {i}/{len(clips)} ---")
-        
-        file_path, msg = download_clip(
-            selected_video['url'],
-            clip['start_sec'],
-            clip['end_sec'],
-            clip_filename,
-            quality,
-            crop_vertical,
-            precise_mode
-        )
-        
-        status_lines.append(f"   {msg}")
+    # Resolve the stream URL once up front: every worker then hits the URL cache
+    # instead of racing to extract the same video, and a dead video fails once
+    try:
+        _resolve_direct_url(video_url, quality)
+    except Exception as e:
+        logger.error("❌ Could not resolve stream URL: %s", e, exc_info=True)
+        return f"❌ Error: {str(e)[:150]}", []
+    
+    enforce_output_quota()
+    
+    # Output names fixed up front, in a folder of their own so concurrent
+    # sessions using the same prefix never overwrite each other's clips
+    batch_dir = new_batch_dir()
+    output_names = [os.path.join(batch_dir, f"{clip_name_prefix}_{i}") for i in range(1, len(clips) + 1)]
+    
+    # Overlapping and nearby ranges share one network fetch when the clips are re-encoded.
+    # Stream-copy clips aren't grouped: a copy cut has to seek on the input side, or its
+    # video starts up to a GOP after its audio, so each fast clip takes its own fetch
+    if precise_mode or crop_vertical:
+        groups = merge_clip_ranges(clips)
+    else:
+        groups = [[clip['start_sec'], clip['end_sec'], [idx]] for idx, clip in enumerate(clips)]
+    max_workers = min(len(groups), MAX_DOWNLOAD_WORKERS)
+    logger.info("Downloading %s clips (%s segments) with %s workers", len(clips), len(groups), max_workers)
+    
+    # Results keyed by clip index so the report reads in paste order
+    results_by_index = {}
+    
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {}
+        for group_start, group_end, indices in groups:
+            members = [(idx + 1, clips[idx]) for idx in indices]
+            if len(members) == 1:
+                i, clip = members[0]
+                future = executor.submit(
+                    download_clip,
+                    video_url,
+                    clip['start_sec'],
+                    clip['end_sec'],
+                    output_names[i - 1],
+                    quality,
+                    crop_vertical,
+                    precise_mode,
+                    mute
+                )
+            else:
+                future = executor.submit(
+                    download_clip_group,
+                    video_url,
+                    group_start,
+                    group_end,
+                    [clip for _, clip in members],
+                    [output_names[i - 1] for i, _ in members],
+                    quality,
+                    crop_vertical,
+                    mute
+                )
+            futures[future] = members
         
-        if file_path and os.path.exists(file_path):
+        for future in as_completed(futures):
+            members = futures[future]
+            results = future.result()
+            if len(members) == 1:
+                results = [results]
+            
+            for (i, clip), (file_path, msg) in zip(members, results):
+                results_by_index[i] = (clip, file_path, msg)
+                
+                if file_path:
+                    logger.info("✅ Clip %s successful: %s", i, file_path)
+                else:
+                    logger.error("❌ Clip %s failed", i)
+    
+    for i in sorted(results_by_index):
+        clip, file_path, msg = results_by_index[i]
+        status_lines.append(f"\n⏳ Clip {i}/{len(clips)}: {clip['start']}-{clip['end']}...\n   {msg}")
+        if file_path:
             downloaded_files.append(file_path)
-            logger.info(f"✅ Clip {i} successful: {file_path}")
-        else:
-            logger.error(f"❌ Clip {i} failed")
     
-    status_lines.append(f"\n\n✅ Successfully downloaded {len(downloaded_files)}/{len(clips)} clips!")
-    status_lines.append(f"\n💾 Download files immediately - they will be deleted when session ends.")
+    status_lines.append(
+        f"\n\n✅ Successfully downloaded {len(downloaded_files)}/{len(clips)} clips!"
+        f"\n\n💾 Download files immediately - they will be deleted when session ends."
+    )
     
-    logger.info(f"=== DOWNLOAD COMPLETE: {len(downloaded_files)}/{len(clips)} successful ===")
+    logger.info("=== DOWNLOAD COMPLETE: %s/%s successful ===", len(downloaded_files), len(clips))
     
     return "\n".join(status_lines), downloaded_files
 
@@ -747,11 +1536,13 @@ with gr.Blocks(title="YouTube Clip Finder", theme=gr.themes.Soft()) as app:
             lines=1
         )
         
-        search_btn = gr.Button("🔎 SEARCH YOUTUBE", variant="primary", size="lg")
+        with gr.Row():
+            search_btn = gr.Button("🔎 SEARCH YOUTUBE", variant="primary", size="lg", scale=4)
+            refresh_btn = gr.Button("🔄 Refresh", size="lg", scale=1)
         search_status = gr.Textbox(label="Status", interactive=False, lines=2)
         
         results_table = gr.Dataframe(
-            headers=["#", "Title", "Views", "Duration", "Uploader"],
+            headers=RESULT_HEADERS,
             datatype=["number", "str", "str", "str", "str"],
             label="📺 Results (Click a row to select)",
             interactive=False,
@@ -759,6 +1550,11 @@ with gr.Blocks(title="YouTube Clip Finder", theme=gr.themes.Soft()) as app:
             visible=False
         )
     
+    # Per-session state (each browser session gets its own results/selection)
+    search_state = gr.State([])
+    selected_state = gr.State(None)
+    preview_state = gr.State(None)
+    
     with gr.Column(visible=False) as video_page:
         back_btn = gr.Button("⬅️ BACK TO SEARCH RESULTS", variant="secondary")
         
@@ -827,6 +1623,11 @@ with gr.Blocks(title="YouTube Clip Finder", theme=gr.themes.Soft()) as app:
                 value=False
             )
             
+            mute_checkbox_preview = gr.Checkbox(
+                label="🔇 Mute audio (faster)", 
+                value=False
+            )
+            
             download_preview_btn = gr.Button("📥 DOWNLOAD WITH ADJUSTED SETTINGS", variant="primary", size="lg")
             download_preview_status = gr.Textbox(label="Download Status", lines=3, interactive=False)
             download_preview_files = gr.File(label="📦 Downloaded Clip", file_count="single")
@@ -850,6 +1651,11 @@ with gr.Blocks(title="YouTube Clip Finder", theme=gr.themes.Soft()) as app:
             value=False
         )
         
+        mute_checkbox = gr.Checkbox(
+            label="🔇 Mute audio (faster)", 
+            value=False
+        )
+        
         download_btn = gr.Button("📥 DOWNLOAD ALL CLIPS", variant="primary", size="lg")
         
         download_status = gr.Textbox(label="Download Status", lines=10, interactive=False)
@@ -859,49 +1665,62 @@ with gr.Blocks(title="YouTube Clip Finder", theme=gr.themes.Soft()) as app:
     search_btn.click(
         fn=perform_search,
         inputs=[search_input],
-        outputs=[search_status, results_table]
+        outputs=[search_status, results_table, search_state]
     )
     
+    refresh_btn.click(
+        fn=refresh_search,
+        inputs=[search_input],
+        outputs=[search_status, results_table, search_state]
+    )
+    
+    # Page switches only touch state (metadata is prefetched in the background), so they
+    # bypass the queue instead of waiting behind searches and downloads
     results_table.select(
         fn=select_video_handler,
-        outputs=[video_info, search_page, video_page, download_status]
+        inputs=[search_state],
+        outputs=[video_info, search_page, video_page, download_status, selected_state],
+        queue=False
     )
     
     back_btn.click(
         fn=go_back_to_search,
-        outputs=[search_page, video_page]
+        outputs=[search_page, video_page],
+        queue=False
     )
     
     # Preview handlers
     preview_btn.click(
         fn=generate_preview_handler,
-        inputs=[timestamps_input, quality_select],
-        outputs=[preview_video, preview_status, preview_editor, trim_start_slider, trim_end_slider, clip_duration_display]
+        inputs=[timestamps_input, quality_select, selected_state, preview_state],
+        outputs=[preview_video, preview_status, preview_editor, trim_start_slider, trim_end_slider, clip_duration_display, preview_state]
     )
     
-    # Update clip info when sliders change
+    # Update clip info when sliders change (cheap, so bypass the queue instead of waiting behind downloads)
     trim_start_slider.change(
         fn=update_clip_info,
         inputs=[trim_start_slider, trim_end_slider],
-        outputs=[clip_duration_display]
+        outputs=[clip_duration_display],
+        queue=False
     )
     
     trim_end_slider.change(
         fn=update_clip_info,
         inputs=[trim_start_slider, trim_end_slider],
-        outputs=[clip_duration_display]
+        outputs=[clip_duration_display],
+        queue=False
     )
     
     download_preview_btn.click(
         fn=download_from_preview,
-        inputs=[clip_name, trim_start_slider, trim_end_slider, crop_checkbox_preview],
+        inputs=[clip_name, trim_start_slider, trim_end_slider, crop_checkbox_preview, mute_checkbox_preview, preview_state],
         outputs=[download_preview_status, download_preview_files]
     )
     
     # Direct download handler
     download_btn.click(
         fn=process_download,
-        inputs=[timestamps_input, clip_name, quality_select, crop_checkbox, precise_mode],
+        inputs=[timestamps_input, clip_name, quality_select, crop_checkbox, precise_mode, mute_checkbox, selected_state],
         outputs=[download_status, download_files]
     )
     
@@ -931,23 +1750,27 @@ with gr.Blocks(title="YouTube Clip Finder", theme=gr.themes.Soft()) as app:
     | **Speed** | 30-60 sec | 2-3 min | 45 sec preview + 2 min encode |
     | **File Size** | ~30 MB | ~25-35 MB | ~25-35 MB |
     | **Accuracy** | ±2-4 sec | Exact | Exact (user-adjusted) |
-    | **Quality** | Original | High (CRF 26) | High (CRF 26) |
+    | **Quality** | Original | High (re-encoded) | High (re-encoded) |
     | **Best for** | Quick previews | Batch precise | Single perfect clip |
     
     ### 🔧 Technical Details:
     - **Fast Mode:** Stream copy (no re-encoding, keyframe-accurate)
-    - **Precise Mode:** Re-encodes with `fast` preset + CRF 26 (optimized compression)
+    - **Precise Mode:** Re-encodes to H.264 on the server's hardware encoder when it has one, otherwise x264
     - **Preview:** Fast stream copy with 5s buffer, then precise re-encode on download
-    - **Vertical Crop:** Scales to 1080x1920 (9:16 ratio) for TikTok/Reels/Shorts
+    - **Vertical Crop:** Scales to 1080x1920 (9:16 ratio) for TikTok/Reels/Shorts (re-encoded)
     
     ⚠️ **Important:** All files are temporary and deleted when session ends. Download immediately!
     
     📝 **Check Render logs** if downloads fail (Dashboard → Logs tab)
     """)
 
+# Queued handlers share QUEUE_CONCURRENCY workers; ffmpeg/yt-dlp load is capped separately
+# by ENCODE_SLOTS and FETCH_SLOTS, so extra workers only let short requests start promptly
+app.queue(concurrency_count=QUEUE_CONCURRENCY, max_size=QUEUE_MAX_SIZE)
+
 if __name__ == "__main__":
     port = int(os.environ.get("PORT", 10000))
-    logger.info(f"Starting app on port {port}")
+    logger.info("Starting app on port %s", port)
     app.launch(
         server_name="0.0.0.0",
         server_port=port,